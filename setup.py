@@ -19,9 +19,6 @@ setup(
     py_modules=["slack_notipy"],
     packages=find_packages("."),
     include_package_data=True,
-    package_data={
-        "slack_notipy": ["config.json"]
-    },
     entry_points={
         'console_scripts':[
             'slack_notipy = slack_notipy:cli',
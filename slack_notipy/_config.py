@@ -1,10 +1,11 @@
-{
+# _config.py
+config_dict = {
     "format": {
         "success": {
             "title": "Success",
             "color": "#00bb83",
             "priority": "Middle"
-            },
+        },
         "info": {
             "title": "Info",
             "color": "#009fbb",
@@ -26,4 +27,4 @@
         "exit": "Context finished."
     },
     "timeout": 5
-}
\ No newline at end of file
+}
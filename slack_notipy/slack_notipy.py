@@ -2,23 +2,167 @@
 # slack_notipy.py
 import os
 import json
+import atexit
+import threading
+from collections import deque
+from copy import deepcopy
+from base64 import b64encode
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial, wraps
+from itertools import count
 from socket import gethostname
-from urllib.request import Request, urlopen
-from urllib.error import URLError
-from hashlib import blake2b
-from datetime import datetime
-from traceback import format_exception
-
-
-with open(os.path.join(os.path.dirname(__file__), "config.json"), mode="r", encoding="utf-8") as f:
-    config_dict = json.load(f)
-    format_dict = config_dict["format"]
-    context_message_dict = config_dict["context_message"]
+from http.client import HTTPConnection, HTTPSConnection, HTTPException, RemoteDisconnected
+from urllib.parse import urlsplit, unquote
+from urllib.request import Request, urlopen, getproxies, proxy_bypass
+from urllib.error import URLError, HTTPError
+from datetime import timedelta
+from time import perf_counter, time
+from traceback import print_exception
+from types import MappingProxyType
+# errors of _dumps on messages which json.dumps can still serialize,
+# e.g. orjson and msgspec reject lone surrogates
+_DUMPS_ERRORS = (TypeError, ValueError)
+try:
+    from orjson import dumps as _dumps
+except ModuleNotFoundError:
+    try:
+        from msgspec.json import encode as _dumps
+        from msgspec import EncodeError as _MsgspecEncodeError
+        _DUMPS_ERRORS = (*_DUMPS_ERRORS, _MsgspecEncodeError)
+    except ModuleNotFoundError:
+        # compact encoder created once instead of per json.dumps call
+        _JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+        def _dumps(obj):
+            return _JSON_ENCODER.encode(obj).encode("ascii")
+try:
+    from msgpack import packb as _packb
+except ModuleNotFoundError:
+    _packb = None
+try:
+    from dotenv import dotenv_values as _dotenv_values
+except ModuleNotFoundError:
+    _dotenv_values = None
+try:
+    from ._config import config_dict
+except ImportError:
+    # run as a script
+    from _config import config_dict
+
+
+format_dict = config_dict["format"]
+context_message_dict = config_dict["context_message"]
+
+_HOSTNAME = gethostname()
+_PID = os.getpid()
+_DEFAULT_FOOTER = f"Slack API called from python on {_HOSTNAME}"
+_AUTHOR_SUFFIX = f" on {_HOSTNAME} (PID: {_PID})"
+# (title, color, priority field) for each message type, resolved with a single lookup
+_FORMAT = MappingProxyType({
+    message_type: (
+        message_format["title"],
+        message_format["color"],
+        {"title": "Priority", "value": message_format["priority"], "short": "true"},
+    )
+    for message_type, message_format in format_dict.items()
+})
+# attachment skeletons holding the defaults of each message type
+_CUSTOM_TEMPLATE = {
+    "fallback": None, "color": None, "author_name": None, "title": None,
+    "text": None, "fields": None, "footer": _DEFAULT_FOOTER, "ts": None,
+}
+_TEMPLATES = MappingProxyType({
+    message_type: {**_CUSTOM_TEMPLATE, "color": color, "title": title}
+    for message_type, (title, color, _) in _FORMAT.items()
+})
+# ids of Notify footers, seeded randomly so that they differ between runs and processes
+_CONTEXT_COUNTER = count(int.from_bytes(os.urandom(4), "big"))
+_DOTENV_LOADED = False
+# variables set from .env by _load_dotenv, with the values it set
+_DOTENV_VARIABLES = {}
+_REQUEST_HEADERS = {'Content-Type': 'application/json; charset=utf-8'}
+_MSGPACK_HEADERS = {'Content-Type': 'application/msgpack'}
+_CONNECTIONS = threading.local()
+_BATCH = threading.local()
+# slack accepts up to 100 attachments in a message
+_MAX_ATTACHMENTS = 100
+# attachments coalesced across threads by enable_batching, sent by the _FLUSHER thread
+_QUEUE = deque()
+_QUEUE_EVENT = threading.Event()
+# held while a batch is taken from the queue and sent, so that the flush at exit waits for it
+_QUEUE_LOCK = threading.Lock()
+_BATCH_INTERVAL = None
+_BATCH_SIZE = 20
+_FLUSHER = None
+# a single worker keeps notifications in the order they were issued
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slack_notipy")
+
+
+def _shutdown_executor():
+    """
+    flush pending notifications at interpreter exit
+    """
+    _EXECUTOR.shutdown(wait=True)
 
 
+def _after_fork_in_child():
+    """
+    refresh the pid and drop the worker thread and sockets inherited from the parent process
+    """
+    global _CONNECTIONS, _EXECUTOR, _PID, _AUTHOR_SUFFIX, _QUEUE_LOCK, _CONTEXT_COUNTER
+    _PID = os.getpid()
+    _CONTEXT_COUNTER = count(int.from_bytes(os.urandom(4), "big"))
+    _AUTHOR_SUFFIX = f" on {_HOSTNAME} (PID: {_PID})"
+    _build_template.cache_clear()
+    # the parent sends its own queued attachments
+    _QUEUE.clear()
+    _QUEUE_LOCK = threading.Lock()
+    if _BATCH_INTERVAL is not None:
+        _start_flusher()
+    _CONNECTIONS = threading.local()
+    _EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slack_notipy")
+
+
+atexit.register(_shutdown_executor)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _load_dotenv():
+    """
+    load .env in the current directory once per process if python-dotenv is available,
+    without overriding variables set by other means
+    """
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    if _dotenv_values is not None:
+        # drop the values of a previous load unless they were changed since
+        for key, value in _DOTENV_VARIABLES.items():
+            if os.environ.get(key) == value:
+                del os.environ[key]
+        _DOTENV_VARIABLES.clear()
+        values = _dotenv_values(os.path.join(os.getcwd(), ".env"), verbose=os.environ.get("SLACK_NOTIPY_DEBUG") == "1")
+        for key, value in values.items():
+            if value is not None and key not in os.environ:
+                os.environ[key] = _DOTENV_VARIABLES[key] = value
+    _DOTENV_LOADED = True
+
+
+_load_dotenv()
+# Slack itself only accepts JSON; msgpack is meant for self-hosted relays
+_USE_MSGPACK = os.environ.get("SLACK_NOTIPY_FORMAT") == "msgpack"
+# turn every notification into a no-op, e.g. for tests and dry runs
+_DISABLED = os.environ.get("SLACK_NOTIPY_DISABLED") == "1"
+# skip notifications silently instead of raising when SLACK_WEBHOOK_URL is not set
+_NO_URL_OK = os.environ.get("SLACK_NOTIPY_NO_URL_OK") == "1"
+
+
+@lru_cache(maxsize=None)
 def get_slack_webhook_url(env_slack_webhook_url="SLACK_WEBHOOK_URL"):
     """
-    get slack_web_hook_url from environmental variable
+    get slack_web_hook_url from environmental variable, cached once resolved
 
     parameters
     --------
@@ -36,7 +180,141 @@ def get_slack_webhook_url(env_slack_webhook_url="SLACK_WEBHOOK_URL"):
     return slack_webhook_url
 
 
-def notify(message, message_type="info", name="python", fields=None, title=None, color=None, footer=None, include_priority=False, ignore_url_error=True):
+def invalidate_webhook_cache():
+    """
+    Forget the cached webhook url and proxy settings and reload .env,
+    so that changes of environment variables take effect on the next notify.
+    Variables set by other means than .env take precedence over .env as at import.
+    SLACK_NOTIPY_DISABLED, SLACK_NOTIPY_NO_URL_OK and SLACK_NOTIPY_FORMAT are read only at import and not reloaded.
+    """
+    global _DOTENV_LOADED
+    _DOTENV_LOADED = False
+    _load_dotenv()
+    get_slack_webhook_url.cache_clear()
+    _get_proxy.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _get_proxy(scheme, hostname):
+    """
+    get the proxy url configured for scheme and hostname, resolved once like urllib does
+    """
+    proxy = getproxies().get(scheme)
+    if proxy is None or proxy_bypass(hostname):
+        return None
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+def _get_connection(scheme, netloc, proxy=None):
+    """
+    get a keep-alive connection to netloc, reused within the current thread
+    """
+    pool = getattr(_CONNECTIONS, "pool", None)
+    if pool is None:
+        pool = _CONNECTIONS.pool = {}
+    conn = pool.get((scheme, netloc, proxy))
+    if conn is None:
+        if proxy is None:
+            connection_class = HTTPSConnection if scheme == "https" else HTTPConnection
+            conn = connection_class(netloc, timeout=config_dict["timeout"])
+        else:
+            # tunnel through the proxy with CONNECT so that the TLS session can be kept alive
+            proxy_parts = urlsplit(proxy)
+            conn = HTTPSConnection(proxy_parts.hostname, proxy_parts.port or 80, timeout=config_dict["timeout"])
+            tunnel_headers = {}
+            if proxy_parts.username:
+                credentials = f"{unquote(proxy_parts.username)}:{unquote(proxy_parts.password or '')}"
+                tunnel_headers["Proxy-Authorization"] = "Basic " + b64encode(credentials.encode("utf-8")).decode("ascii")
+            conn.set_tunnel(netloc, headers=tunnel_headers)
+        pool[(scheme, netloc, proxy)] = conn
+    return conn
+
+
+def _post(url, data, headers):
+    """
+    POST data to url over a pooled keep-alive connection
+
+    parameters
+    --------
+    url : str
+        destination url
+
+    data : bytes
+        request body
+
+    headers : dict
+        request headers
+
+    returns
+    ------
+    None : None
+    """
+    parts = urlsplit(url)
+    proxy = _get_proxy(parts.scheme, parts.hostname) if parts.scheme in ("http", "https") else None
+    if parts.scheme not in ("http", "https") or (proxy is not None and (parts.scheme != "https" or not proxy.startswith("http://"))):
+        # let urllib handle plain http over proxies, https proxies and exotic schemes
+        req = Request(url=url, data=data, headers=headers, method='POST')
+        with urlopen(req, timeout=config_dict["timeout"]):
+            return
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    for retry in (True, False):
+        conn = _get_connection(parts.scheme, parts.netloc, proxy)
+        reused = conn.sock is not None
+        try:
+            conn.request("POST", path, body=data, headers=headers)
+            res = conn.getresponse()
+            res.read()
+        except (HTTPException, OSError) as error:
+            conn.close()
+            if retry and reused and isinstance(error, (RemoteDisconnected, ConnectionResetError, BrokenPipeError)):
+                # the server dropped an idle keep-alive connection; timeouts are not retried
+                # since the request may already have been delivered
+                continue
+            raise URLError(error) from error
+        if res.status >= 400:
+            raise HTTPError(url, res.status, res.reason, res.headers, None)
+        return
+
+
+def _encode(message_json):
+    """
+    serialize a message into a request body and its headers
+    """
+    if _USE_MSGPACK:
+        if _packb is None:
+            raise RuntimeError("SLACK_NOTIPY_FORMAT=msgpack requires msgpack. Please install it or unset SLACK_NOTIPY_FORMAT.")
+        return _packb(message_json), _MSGPACK_HEADERS
+    try:
+        return _dumps(message_json), _REQUEST_HEADERS
+    except _DUMPS_ERRORS:
+        # json escapes lone surrogates, e.g. from surrogateescape, instead of rejecting them
+        return json.dumps(message_json).encode("utf-8"), _REQUEST_HEADERS
+
+
+def _join_attachments(encoded_attachments):
+    """
+    build a request body and its headers from attachments serialized one by one with _encode
+    """
+    if _USE_MSGPACK:
+        # a map of one "attachments" key holding an array16, enough for _MAX_ATTACHMENTS
+        return b"\x81\xabattachments\xdc" + len(encoded_attachments).to_bytes(2, "big") + b"".join(encoded_attachments), _MSGPACK_HEADERS
+    return b'{"attachments":[' + b",".join(encoded_attachments) + b"]}", _REQUEST_HEADERS
+
+
+def _report_url_error(future):
+    """
+    report an error raised while sending a notification in background
+    """
+    error = future.exception()
+    if isinstance(error, OSError):
+        print('Could not reach the slack server, but do not raise an Error since ignore_url_error = TRUE. Please check the SLACK_WEB_HOOK_URL and the network connection later.')
+    elif error is not None:
+        print(f'Could not send a message to the slack server ({error!r}), but do not raise an Error since ignore_url_error = TRUE. Please check the SLACK_WEB_HOOK_URL later.')
+
+
+def notify(message, message_type="info", name="python", fields=None, title=None, color=None, footer=None, include_priority=False, ignore_url_error=True, sync=False):
     """
     Notify a message
 
@@ -69,29 +347,49 @@ def notify(message, message_type="info", name="python", fields=None, title=None,
     ignore_url_error : bool
         whether to ignore an Error during sending a message, default True
 
+    sync : bool
+        whether to wait until the message is sent, default False.
+        Messages are always sent synchronously if ignore_url_error is False.
+
     returns
     ------
     None : None
     """
+    if _DISABLED:
+        return
     try:
+        try:
+            url = get_slack_webhook_url(env_slack_webhook_url="SLACK_WEBHOOK_URL")
+        except OSError:
+            if _NO_URL_OK:
+                return
+            raise
         if isinstance(message, str):
             message_json = make_message(text=message, name=name, message_type=message_type, title=title, color=color, footer=footer, fields=fields, include_priority=include_priority)
         elif isinstance(message, dict):
             message_json = message
         else:
             raise RuntimeError("Bad type of message is given.")
-        json_data = json.dumps(message_json).encode("utf-8")
-        request_headers = { 'Content-Type': 'application/json; charset=utf-8' }
-        try:
-            from dotenv import load_dotenv
-            load_dotenv(os.path.join(os.getcwd(), ".env"), verbose=True)
-        except ModuleNotFoundError:
-            pass
-        url = get_slack_webhook_url(env_slack_webhook_url="SLACK_WEBHOOK_URL")
-        if url is None:
-            raise RuntimeError("SLACK_WEBHOOK_URL is not set.")
-        req = Request(url=url, data=json_data, headers=request_headers, method='POST')
-        urlopen(req, timeout=config_dict["timeout"])
+        batch = getattr(_BATCH, "attachments", None)
+        if batch is not None and ignore_url_error and not sync and message_json.keys() == {"attachments"}:
+            # copy so that later changes of the caller's fields do not alter the collected message
+            batch.extend(deepcopy(message_json["attachments"]))
+            return
+        if _BATCH_INTERVAL is not None and ignore_url_error and not sync and message_json.keys() == {"attachments"}:
+            # queue serialized attachments, which snapshots them and raises encoding errors here
+            _QUEUE.extend([_encode(attachment)[0] for attachment in message_json["attachments"]])
+            if len(_QUEUE) >= _BATCH_SIZE:
+                _QUEUE_EVENT.set()
+            return
+        data, headers = _encode(message_json)
+        if ignore_url_error and not sync:
+            try:
+                _EXECUTOR.submit(_post, url, data, headers).add_done_callback(_report_url_error)
+                return
+            except RuntimeError:
+                # the executor is already shut down at interpreter exit
+                pass
+        _post(url, data, headers)
     except URLError as url_error:
         if ignore_url_error:
             print('Could not reach the slack server, but do not raise an Error since ignore_url_error = TRUE. Please check the SLACK_WEB_HOOK_URL and the network connection later.')
@@ -99,6 +397,187 @@ def notify(message, message_type="info", name="python", fields=None, title=None,
             raise RuntimeError('Could not reach slack server. Please check the SLACK_WEB_HOOK_URL and the network connection.') from url_error
 
 
+async def notify_async(message, message_type="info", name="python", fields=None, title=None, color=None, footer=None, include_priority=False, ignore_url_error=True):
+    """
+    Notify a message from a coroutine and wait until it is sent without blocking the event loop
+
+    parameters
+    --------
+    same as notify
+
+    returns
+    ------
+    None : None
+    """
+    # asyncio is already loaded when a coroutine runs, so importing here keeps import of this module light
+    import asyncio
+    await asyncio.get_running_loop().run_in_executor(
+        _EXECUTOR,
+        partial(
+            notify,
+            message,
+            message_type=message_type,
+            name=name,
+            fields=fields,
+            title=title,
+            color=color,
+            footer=footer,
+            include_priority=include_priority,
+            ignore_url_error=ignore_url_error,
+            sync=True,
+        ),
+    )
+
+
+def start_batch():
+    """
+    Start collecting notifications of the current thread to send them as one message.
+    Calls may be nested; notifications are sent by the flush_batch matching the outermost call.
+    Notifications with sync=True or ignore_url_error=False are sent immediately.
+    """
+    if getattr(_BATCH, "attachments", None) is None:
+        _BATCH.attachments = []
+        _BATCH.depth = 0
+    _BATCH.depth += 1
+
+
+def flush_batch(ignore_url_error=True):
+    """
+    Send notifications collected since the outermost start_batch and stop collecting
+
+    parameters
+    --------
+    ignore_url_error : bool
+        whether to ignore an Error during sending a message, default True
+
+    returns
+    ------
+    None : None
+    """
+    attachments = getattr(_BATCH, "attachments", None)
+    if attachments is None:
+        return
+    _BATCH.depth -= 1
+    if _BATCH.depth > 0:
+        return
+    _BATCH.attachments = None
+    if not attachments:
+        return
+    for i in range(0, len(attachments), _MAX_ATTACHMENTS):
+        notify({"attachments": attachments[i:i + _MAX_ATTACHMENTS]}, ignore_url_error=ignore_url_error)
+
+
+def _flush_queue():
+    """
+    send the attachments coalesced by enable_batching in messages of up to _BATCH_SIZE attachments
+    """
+    while True:
+        # taking the lock before looking at the queue waits for a batch being sent by another thread
+        with _QUEUE_LOCK:
+            attachments = []
+            try:
+                while len(attachments) < _BATCH_SIZE:
+                    attachments.append(_QUEUE.popleft())
+            except IndexError:
+                if not attachments:
+                    return
+            try:
+                data, headers = _join_attachments(attachments)
+                _post(get_slack_webhook_url(env_slack_webhook_url="SLACK_WEBHOOK_URL"), data, headers)
+            except OSError:
+                print('Could not reach the slack server, but do not raise an Error since ignore_url_error = TRUE. Please check the SLACK_WEB_HOOK_URL and the network connection later.')
+            except Exception as error:
+                print(f'Could not send a message to the slack server ({error!r}), but do not raise an Error since ignore_url_error = TRUE. Please check the SLACK_WEB_HOOK_URL later.')
+
+
+def _drain_queue():
+    """
+    flush the queue every _BATCH_INTERVAL seconds or as soon as _BATCH_SIZE attachments are queued
+    """
+    while True:
+        _QUEUE_EVENT.wait(_BATCH_INTERVAL)
+        _QUEUE_EVENT.clear()
+        try:
+            _flush_queue()
+        except Exception:
+            # keep the flusher alive for the next batches
+            pass
+
+
+def _start_flusher():
+    """
+    start the thread sending coalesced attachments
+    """
+    global _FLUSHER
+    _FLUSHER = threading.Thread(target=_drain_queue, name="slack_notipy-batch", daemon=True)
+    _FLUSHER.start()
+
+
+def enable_batching(interval=0.2, max_size=20):
+    """
+    Coalesce notifications of all threads and send them together
+
+    parameters
+    --------
+    interval : float
+        maximum delay in seconds before queued notifications are sent, must be positive and finite, default 0.2
+
+    max_size : int
+        number of queued notifications which triggers sending them at once, at most 100, default 20
+
+    returns
+    ------
+    None : None
+    """
+    global _BATCH_INTERVAL, _BATCH_SIZE
+    if not 0 < interval < float("inf"):
+        raise ValueError(f"interval must be a positive finite number, but {interval!r} is given.")
+    _BATCH_INTERVAL = interval
+    _BATCH_SIZE = max(1, min(max_size, _MAX_ATTACHMENTS))
+    if _FLUSHER is None or not _FLUSHER.is_alive():
+        _start_flusher()
+    else:
+        # wake the flusher up to pick up the new interval
+        _QUEUE_EVENT.set()
+
+
+def disable_batching():
+    """
+    Stop coalescing notifications and send the queued ones
+    """
+    global _BATCH_INTERVAL
+    _BATCH_INTERVAL = None
+    _flush_queue()
+
+
+atexit.register(_flush_queue)
+if os.environ.get("SLACK_NOTIPY_BATCH_INTERVAL"):
+    try:
+        enable_batching(interval=float(os.environ["SLACK_NOTIPY_BATCH_INTERVAL"]))
+    except ValueError:
+        print(f'Ignore SLACK_NOTIPY_BATCH_INTERVAL={os.environ["SLACK_NOTIPY_BATCH_INTERVAL"]!r} since it is not a positive number of seconds.')
+
+
+@lru_cache(maxsize=32)
+def _build_template(message_type, name, title, color):
+    """
+    build the attachment skeleton and fallback prefix shared by messages with the same static arguments
+    """
+    template = _TEMPLATES.get(message_type)
+    if template is None:
+        # custom message types take title and color from the arguments
+        if title is None or color is None:
+            raise KeyError(message_type)
+        template = _CUSTOM_TEMPLATE
+    template = template.copy()
+    if title is not None:
+        template["title"] = title
+    if color is not None:
+        template["color"] = color
+    template["author_name"] = f"{name}{_AUTHOR_SUFFIX}"
+    return template, f"{template['title']} on {_HOSTNAME}: "
+
+
 def make_message(text, message_type="info", name="python", fields=None, title=None, color=None, footer=None, include_priority=False):
     """
     Make a message
@@ -133,41 +612,46 @@ def make_message(text, message_type="info", name="python", fields=None, title=No
     ------
     dict
     """
-    if title is None:
-        title = format_dict[message_type]["title"]
-    if color is None:
-        color = format_dict[message_type]["color"]
-    if footer is None:
-        footer = f"Slack API called from python on {gethostname()}"
-    if fields is None:
-        fields = []
     if include_priority:
-        field_property = {
-            "title": "Priority",
-            "value": format_dict[message_type]["priority"],
-            "short": "true"
-        }
-        fields.append(field_property)
-    default_attachment = {
-        "fallback": f"{title} on {gethostname()}: {text}",
-        "color": color,
-        "author_name": f"{name} on {gethostname()} (PID: {os.getpid()})",
-        "title": title,
-        "text": text,
-        "fields": fields,
-        "footer": footer,
-        "ts": int(datetime.now().timestamp())
-    }
+        priority_field = _FORMAT[message_type][2]
+        fields = [*fields, priority_field] if fields else [priority_field]
+    elif fields is None:
+        fields = []
+    # footers of Notify and context_wrapper differ per instance, so they are not part of the cached template
+    template, fallback_prefix = _build_template(message_type, name, title, color)
+    default_attachment = template.copy()
+    if footer is not None:
+        default_attachment["footer"] = footer
+    default_attachment["fallback"] = f"{fallback_prefix}{text}"
+    default_attachment["text"] = text
+    default_attachment["fields"] = fields
+    default_attachment["ts"] = int(time())
     return {"attachments": [default_attachment,]}
 
 
+def _format_traceback(exc_type, exc_value, exc_traceback):
+    """
+    format an exception into a code block written to a single buffer
+    """
+    buffer = StringIO()
+    buffer.write("```")
+    print_exception(exc_type, exc_value, exc_traceback, file=buffer)
+    buffer.write("```")
+    return buffer.getvalue()
+
+
 class Notify():
     """
     Context manager for notification by Slack Incoming Webhook
     """
+    __slots__ = (
+        "name", "hash", "footer", "fields", "timer", "exception_only", "send_flag",
+        "notify_start", "start_time", "end_time", "catch_exception",
+    )
+
     def __init__(self, name="python", timer=True, exception_only=False, send_flag=True, notify_start=False, catch_exception=()):
         self.name = name
-        self.hash = blake2b(repr(self).encode("utf-8"), digest_size=5).hexdigest()
+        self.hash = f"{next(_CONTEXT_COUNTER):010x}"
         self.footer = f"slack_notipy context manager #{self.hash}"
         self.fields = dict()
         self.timer = timer
@@ -180,7 +664,7 @@ class Notify():
 
     def __enter__(self):
         if self.timer:
-            self.start_time = datetime.now()
+            self.start_time = perf_counter()
         if self.exception_only or not self.send_flag or not self.notify_start:
             pass
         else:
@@ -194,83 +678,108 @@ class Notify():
 
     def _convert_fields(self):
         """
-        convert fields for notification
+        convert fields into a new list for notification, leaving self.fields as set by the user
         """
         if isinstance(self.fields, dict):
-            self.fields = [
+            return [
                 {"title": str(key), "value": str(value), "short": "true"}
                 for key, value in self.fields.items()
             ]
-        else:
-            try:
-                self.fields = [
-                    {"title": "return", "value": str(self.fields), "short": "true"}
-                ]
-            except ValueError:
-                self.fields = []
+        try:
+            return [
+                {"title": "return", "value": str(self.fields), "short": "true"}
+            ]
+        except ValueError:
+            return []
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self._convert_fields()
         if self.timer:
-            self.end_time = datetime.now()
-            self.fields += [
-                {
-                    "title": "Duration",
-                    "value": format_duration(self.end_time - self.start_time),
-                    "short": "true"
-                },
-            ]
+            self.end_time = perf_counter()
+        if _DISABLED:
+            return exc_type is None or isinstance(exc_value, self.catch_exception)
+        if exc_type is None and (self.exception_only or not self.send_flag):
+            return True
+        if self.exception_only and isinstance(exc_value, self.catch_exception):
+            return True
+        fields = self._convert_fields()
+        if self.timer:
+            fields.append({
+                "title": "Duration",
+                "value": format_duration(self.end_time - self.start_time),
+                "short": "true"
+            })
         if exc_type is None:
-            if self.exception_only or not self.send_flag:
-                return True
             notify(
                 context_message_dict["exit"],
                 message_type="success",
                 name=self.name,
                 footer=self.footer,
-                fields=self.fields
+                fields=fields
             )
             return True
-        elif isinstance(exc_value, self.catch_exception):
-            if self.exception_only:
-                pass
-            else:
-                notify(
-                    "```" + "".join(format_exception(exc_type, exc_value, exc_traceback)) + "```",
-                    message_type="info",
-                    title="Exception caught",
-                    name=self.name,
-                    footer=self.footer,
-                    fields=self.fields + [{"title": "Exception type", "value": str(exc_type), "short": "true"}, ]
-                )
-            return True
+        # (message type, title, field title, whether to suppress the exception)
+        if isinstance(exc_value, self.catch_exception):
+            message_type, title, field_title, suppress = "info", "Exception caught", "Exception type", True
         elif isinstance(exc_value, Warning):
-            notify(
-                "```" + "".join(format_exception(exc_type, exc_value, exc_traceback)) + "```",
-                message_type="warning",
-                name=self.name,
-                footer=self.footer,
-                fields=self.fields + [{"title": "Error type", "value": str(exc_type), "short": "true"}, ]
-            )
-            return False
+            message_type, title, field_title, suppress = "warning", None, "Error type", False
         else:
-            notify(
-                "```" + "".join(format_exception(exc_type, exc_value, exc_traceback)) + "```",
-                message_type="error",
-                name=self.name,
-                footer=self.footer,
-                fields=self.fields + [{"title": "Error type", "value": str(exc_type), "short": "true"}, ]
-            )
-            return False
+            message_type, title, field_title, suppress = "error", None, "Error type", False
+        fields.append({"title": field_title, "value": str(exc_type), "short": "true"})
+        notify(
+            _format_traceback(exc_type, exc_value, exc_traceback),
+            message_type=message_type,
+            title=title,
+            name=self.name,
+            footer=self.footer,
+            fields=fields
+        )
+        return suppress
+
+
+class AsyncNotify(Notify):
+    """
+    Asynchronous context manager for notification by Slack Incoming Webhook
+
+    Notifications are sent in background, so entering and exiting do not block the event loop.
+    """
+    __slots__ = ()
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        return self.__exit__(exc_type, exc_value, exc_traceback)
 
 
-def context_wrapper(name="python", timer=True, exception_only=False, catch_exception=()):
+class Batch():
+    """
+    Context manager to send notifications issued in the with statement as one message
+    """
+    __slots__ = ("ignore_url_error",)
+
+    def __init__(self, ignore_url_error=True):
+        self.ignore_url_error = ignore_url_error
+
+    def __enter__(self):
+        start_batch()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        flush_batch(ignore_url_error=self.ignore_url_error)
+        return False
+
+
+def context_wrapper(name="python", timer=True, exception_only=False, send_flag=True, catch_exception=()):
     """
     Context wrapper
     """
     def _context_wrapper(func):
+        if _DISABLED and not catch_exception:
+            return func
+
+        @wraps(func)
         def run(*args, **kwargs):
-            with Notify(name=name, timer=timer, exception_only=exception_only, catch_exception=catch_exception) as s:
+            with Notify(name=name, timer=timer, exception_only=exception_only, send_flag=send_flag, catch_exception=catch_exception) as s:
                 s.footer = f"slack_notipy decorator #{s.hash}"
                 result = func(*args, **kwargs)
                 s.fields = result
@@ -290,7 +799,7 @@ def cli():
     ap.add_argument("--title", type=str, default=None, help="title, default: default name corresponding to message type")
     ap.add_argument("--message_type", type=str, default="info", help="message type, default: info")
     ap.add_argument("--color", type=str, default=None, help="color, default: default color scheme corresponding to message type")
-    ap.add_argument("--footer", type=str, default=f"slack_notipy:cli on {gethostname()}", help="footer, default: slack_notipy:cli on [HOSTNAME]")
+    ap.add_argument("--footer", type=str, default=f"slack_notipy:cli on {_HOSTNAME}", help="footer, default: slack_notipy:cli on [HOSTNAME]")
     args = ap.parse_args()
     notify(
         args.message,
@@ -301,17 +810,18 @@ def cli():
         color=args.color,
         footer=args.footer,
         include_priority=False,
+        sync=True,
     )
 
 
 def format_duration(dt, length=2):
     '''
-    format a datetime.timedelta object into an easily-readable string object
+    format a duration into an easily-readable string object
 
     parameters
     ------
-    dt : datetime.timedela
-        input timedelta
+    dt : datetime.timedelta or float
+        input timedelta or duration in seconds
 
     length : int
         length used for output, default 2
@@ -321,14 +831,15 @@ def format_duration(dt, length=2):
     formatted_string : str
         formatted string
     '''
-    second = int(dt.total_seconds() % 60)
-    minute = int(dt.total_seconds() // 60)
-    minute = minute % 60
-    hour = minute // 60
-    day = hour // 24
-    hour = hour % 24
-    microseconds = dt.microseconds / 1000.
-    time_list = [day, hour, minute, second, microseconds]
+    if isinstance(dt, timedelta):
+        microseconds = dt // timedelta(microseconds=1)
+    else:
+        microseconds = round(dt * 1000000)
+    second, microseconds = divmod(microseconds, 1000000)
+    minute, second = divmod(second, 60)
+    hour, minute = divmod(minute, 60)
+    day, hour = divmod(hour, 24)
+    time_list = [day, hour, minute, second, microseconds / 1000.]
     time_all = [f"{d}{label}" for d, label in zip(time_list, ["d", "h", "m", "s", "ms"]) if d!=0]
     return " ".join(time_all[:min(length, len(time_all))])
 